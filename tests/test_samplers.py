@@ -1,7 +1,4 @@
 import pytest
-import os
-import shutil
-from pathlib import Path
 import operator
 
 from skimage import transform
@@ -12,21 +9,67 @@ import math
 import numpy as np
 
 
-@pytest.fixture(scope="function")
-def image_collection(request):
-    dst_dir = request.param["dst_dir"]
+RNG_SEED = 447788
+
+
+@pytest.fixture(autouse=True)
+def _seed():
+    # This runs before the image collection fixtures; `_generated_sources`
+    # restores the RNG state after generating data, so tests still start from
+    # the freshly seeded state.
+    np.random.seed(RNG_SEED)
+    yield
+
+
+def _downscale_any(mask, fy, fx):
+    """Downscale a 2D mask by blocks of size `fy`x`fx`, keeping a block when
+    any of its pixels are set. Incomplete blocks at the edges are padded with
+    zeros, as in `skimage.transform.downscale_local_mean`.
+    """
+    h, w = mask.shape
+    padded_mask = np.zeros((-(-h // fy) * fy, -(-w // fx) * fx), dtype=bool)
+    padded_mask[:h, :w] = mask
+    padded_mask = padded_mask.reshape(padded_mask.shape[0] // fy, fy,
+                                      padded_mask.shape[1] // fx, fx)
+    return padded_mask.any(axis=(1, 3))
+
+
+@pytest.fixture(scope="session")
+def _generated_sources(tmp_path_factory):
+    root_dir = tmp_path_factory.mktemp("generated_sources")
+    cache = {}
+
+    def get_sources(source, specs, dst_dir):
+        key = (id(source), repr(sorted(specs.items())), dst_dir)
+
+        if key not in cache:
+            if dst_dir is not None:
+                dst_dir = root_dir / dst_dir
+                dst_dir.mkdir(parents=True, exist_ok=True)
+                dst_dir = str(dst_dir)
+
+            # Keep the global RNG state independent of cache hits.
+            rng_state = np.random.get_state()
+            cache[key] = source(dst_dir, specs)
+            np.random.set_state(rng_state)
+
+        return cache[key]
+
+    yield get_sources
 
-    if dst_dir is not None:
-        dst_dir = Path(request.param["dst_dir"])
-        dst_dir.mkdir(parents=True, exist_ok=True)
+    cache.clear()
 
+
+@pytest.fixture(scope="function")
+def image_collection(request, _generated_sources):
     mask_args = None
     if not isinstance(request.param["source"], str):
         (img_src,
          mask_src,
          labels_src,
-         classes_src) = request.param["source"](request.param["dst_dir"],
-                                                request.param["specs"])
+         classes_src) = _generated_sources(request.param["source"],
+                                           request.param["specs"],
+                                           request.param["dst_dir"])
 
         if mask_src is not None:
             mask_args = dict(
@@ -55,23 +98,15 @@ def image_collection(request):
 
     yield image_collection
 
-    if dst_dir is not None and os.path.isdir(dst_dir):
-        shutil.rmtree(dst_dir)
-
 
 @pytest.fixture(scope="function")
-def image_collection_mask_not2scale(request):
-    dst_dir = request.param["dst_dir"]
-
-    if dst_dir is not None:
-        dst_dir = Path(request.param["dst_dir"])
-        dst_dir.mkdir(parents=True, exist_ok=True)
-
+def image_collection_mask_not2scale(request, _generated_sources):
     (img_src,
      mask_src,
      labels_src,
-     classes_src) = request.param["source"](request.param["dst_dir"],
-                                            request.param["specs"])
+     classes_src) = _generated_sources(request.param["source"],
+                                       request.param["specs"],
+                                       request.param["dst_dir"])
 
     collection_args = dict(
         images=dict(
@@ -90,9 +125,6 @@ def image_collection_mask_not2scale(request):
 
     yield image_collection
 
-    if dst_dir is not None and os.path.isdir(dst_dir):
-        shutil.rmtree(dst_dir)
-
 
 @pytest.mark.parametrize("patch_size", [
     512,
@@ -191,7 +223,7 @@ def test_PatchSampler_incorrect_pad(pad, spatial_axes):
 @pytest.mark.parametrize("patch_size, image_collection", [
     (32, IMAGE_SPECS[10])
 ], indirect=["image_collection"])
-def test_PatchSampler_chunk_generation(patch_size, image_collection):
+def test_PatchSampler_chunks_and_patches(patch_size, image_collection):
     patch_sampler = zds.PatchSampler(patch_size)
 
     chunks_toplefts = patch_sampler.compute_chunks(image_collection)
@@ -209,36 +241,29 @@ def test_PatchSampler_chunk_generation(patch_size, image_collection):
         if ax in image_collection.collection["masks"].axes
     }
 
-    scaled_mask = transform.downscale_local_mean(
+    scaled_mask = _downscale_any(
         image_collection.collection["masks"][:],
-        factors=(scaled_chunk_size["Y"], scaled_chunk_size["X"])
+        scaled_chunk_size["Y"],
+        scaled_chunk_size["X"]
     )
-    expected_chunks_toplefts = np.nonzero(scaled_mask)
+    ys, xs = np.nonzero(scaled_mask)
+
+    ys_start = ys * chunk_size["Y"]
+    ys_stop = (ys + 1) * chunk_size["Y"]
+    xs_start = xs * chunk_size["X"]
+    xs_stop = (xs + 1) * chunk_size["X"]
 
+    z_slice = slice(0, 1, None)
     expected_chunks_toplefts = [
-        dict(
-            [("Z", slice(0, 1, None))]
-            + [
-               (ax, slice(tl * chunk_size[ax], (tl + 1) * chunk_size[ax]))
-               for ax, tl in zip("YX", tls)
-            ]
-        )
-        for tls in zip(*expected_chunks_toplefts)
+        dict(Z=z_slice, Y=slice(int(y0), int(y1)), X=slice(int(x0), int(x1)))
+        for y0, y1, x0, x1 in zip(ys_start, ys_stop, xs_start, xs_stop)
     ]
 
-    assert all(map(operator.eq, chunks_toplefts, expected_chunks_toplefts)), \
+    assert (len(chunks_toplefts) == len(expected_chunks_toplefts)
+            and chunks_toplefts == expected_chunks_toplefts), \
         (f"Expected chunks to be {expected_chunks_toplefts[:3]}, got "
          f"{chunks_toplefts[:3]} instead.")
 
-
-@pytest.mark.parametrize("patch_size, image_collection", [
-    (32, IMAGE_SPECS[10])
-], indirect=["image_collection"])
-def test_PatchSampler(patch_size, image_collection):
-    patch_sampler = zds.PatchSampler(patch_size)
-
-    chunks_toplefts = patch_sampler.compute_chunks(image_collection)
-
     patches_toplefts = patch_sampler.compute_patches(
         image_collection,
         chunk_tlbr=chunks_toplefts[0]
@@ -249,24 +274,25 @@ def test_PatchSampler(patch_size, image_collection):
         for ax, scl in image_collection.collection["masks"].scale.items()
     }
 
-    scaled_mask = transform.downscale_local_mean(
+    scaled_mask = _downscale_any(
         image_collection.collection["masks"][chunks_toplefts[0]],
-        factors=(scaled_patch_size["Y"], scaled_patch_size["X"])
+        scaled_patch_size["Y"],
+        scaled_patch_size["X"]
     )
-    expected_patches_toplefts = np.nonzero(scaled_mask)
+    ys, xs = np.nonzero(scaled_mask)
+
+    ys_start = ys * patch_size
+    ys_stop = (ys + 1) * patch_size
+    xs_start = xs * patch_size
+    xs_stop = (xs + 1) * patch_size
 
     expected_patches_toplefts = [
-        dict(
-            [("Z", slice(0, 1, None))]
-            + [
-               (ax, slice(tl * patch_size, (tl + 1) * patch_size))
-               for ax, tl in zip("YX", tls)
-            ]
-        )
-        for tls in zip(*expected_patches_toplefts)
+        dict(Z=z_slice, Y=slice(int(y0), int(y1)), X=slice(int(x0), int(x1)))
+        for y0, y1, x0, x1 in zip(ys_start, ys_stop, xs_start, xs_stop)
     ]
 
-    assert all(map(operator.eq, patches_toplefts, expected_patches_toplefts)),\
+    assert (len(patches_toplefts) == len(expected_patches_toplefts)
+            and patches_toplefts == expected_patches_toplefts), \
         (f"Expected patches to be {expected_patches_toplefts[:3]}, got "
          f"{patches_toplefts[:3]} instead.")
 
@@ -388,8 +414,6 @@ def test_PatchSampler_incomplete_patches(patch_size, allow_incomplete_patches,
 ], indirect=["image_collection"])
 def test_BlueNoisePatchSampler(patch_size, axes, resample, allow_overlap,
                                image_collection):
-    np.random.seed(447788)
-
     patch_sampler = zds.BlueNoisePatchSampler(patch_size,
                                               resample_positions=resample,
                                               allow_overlap=allow_overlap,
@@ -411,8 +435,6 @@ def test_BlueNoisePatchSampler(patch_size, axes, resample, allow_overlap,
     IMAGE_SPECS[10]
 ], indirect=["image_collection_mask_not2scale"])
 def test_BlueNoisePatchSampler_mask_not2scale(image_collection_mask_not2scale):
-    np.random.seed(447788)
-
     patch_size = dict(X=1024, Y=1024)
 
     patch_sampler = zds.BlueNoisePatchSampler(patch_size)